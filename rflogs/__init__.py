@@ -1,15 +1,49 @@
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import gzip
-from html.parser import HTMLParser
+import html
+import io
 import os
 import re
-import sys
-from typing import Any, Dict, List, Set, Tuple
-import xml.etree.ElementTree as ET
-from urllib.parse import urljoin
+import shutil
+import stat
+import struct
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple
+import zlib
 from importlib.metadata import version, PackageNotFoundError
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
+
+try:
+    # lxml parses output.xml in C when it is available
+    from lxml import etree as ET
+
+    HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+    HAVE_LXML = False
+
+try:
+    # orjson encodes and decodes API payloads in C
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, allow_nan=False).encode("utf-8")
+
+    _json_loads = json.loads
+
 
 try:
     __version__ = version("rflogs")
@@ -17,13 +51,83 @@ except PackageNotFoundError:
     # package is not installed
     __version__ = "unknown"
 
+
+def _env_number(
+    name: str,
+    default: Optional[str],
+    convert,
+    minimum: Optional[float] = None,
+    maximum: Optional[float] = None,
+):
+    # Numeric settings are read at import time, so a bad value must not
+    # break every command or surface halfway through an upload
+    value = os.environ.get(name) or default
+    if value is None:
+        return None
+    try:
+        number = convert(value)
+        if (minimum is None or number >= minimum) and (
+            maximum is None or number <= maximum
+        ):
+            return number
+    except (ValueError, OverflowError):
+        pass
+    fallback = "" if default is None else f", using the default {default}"
+    print(f"Ignoring invalid {name} '{value}'{fallback}.")
+    return None if default is None else convert(default)
+
+
 # Use environment variable to override base URL, defaulting to production
 BASE_URL = os.environ.get("RFLOGS_BASE_URL", "https://rflogs.io")
-TAG_KEY_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9_.-]{0,49}$")
-TAG_VALUE_PATTERN = re.compile(r"^[a-zA-Z0-9_.\-/\s]{1,100}$")
+RUNS_URL = f"{BASE_URL}/api/runs"
+FILES_URL = f"{BASE_URL}/files"
+# "key" or "key:value"; a tag without a value gets the value "true"
+TAG_PATTERN = re.compile(
+    r"^(?P<key>[a-zA-Z][a-zA-Z0-9_.-]{0,49})(?:\s*:\s*(?P<value>[a-zA-Z0-9_.\-/\s]{1,100}))?$"
+)
+# Start tags in the HTML of Robot Framework log messages, and the attributes
+# inside them. Quoted values are consumed whole, so neither a ">" nor text that
+# looks like an attribute inside a value is mistaken for markup.
+START_TAG_PATTERN = re.compile(r"""<[a-zA-Z][^\s/>]*((?:"[^"]*"|'[^']*'|[^"'>])*)>""")
+ATTRIBUTE_PATTERN = re.compile(
+    r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?"""
+)
+# Number of files compressed and uploaded concurrently
+UPLOAD_WORKERS = _env_number("RFLOGS_UPLOAD_WORKERS", "8", int, minimum=1)
+# Only output.xml is known to be accepted gzip-compressed by the server
+PRECOMPRESS = os.environ.get("RFLOGS_PRECOMPRESS", "1") != "0"
+COMPRESS_FILE_NAME = "output.xml"
+COMPRESS_MIN_SIZE = _env_number(
+    "RFLOGS_PRECOMPRESS_MB", "0.5", lambda mb: int(float(mb) * 1024 * 1024), minimum=0
+)
+# Files above this size favour compression speed over size
+FAST_GZIP_MIN_SIZE = 10 * 1024 * 1024
+# Overrides the size based compression level when set
+GZIP_LEVEL = _env_number("RFLOGS_GZIP_LEVEL", None, int, minimum=1, maximum=9)
+COMPRESS_CHUNK_SIZE = 1024 * 1024
+COMPRESS_IN_MEMORY_MAX_SIZE = 64 * 1024 * 1024
+# Files above this size are deflated in blocks on all CPU cores
+PARALLEL_GZIP_MIN_SIZE = 8 * 1024 * 1024
+GZIP_WORKERS = os.cpu_count() or 1
+GZIP_MAGIC = b"\x1f\x8b"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Transient server errors are retried with exponential backoff
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+
+# Shared by all commands so that connections are kept alive between requests
+_session: Optional[requests.Session] = None
+# Run details by run ID, so a run is fetched once per process
+_run_info_cache: Dict[str, Dict] = {}
 
 
 def get_session():
+    global _session
+    if _session is not None:
+        return _session
+
     api_key = os.environ.get("RFLOGS_API_KEY")
     if not api_key:
         raise Exception(
@@ -32,6 +136,24 @@ def get_session():
         )
     session = requests.Session()
     session.headers.update({"X-API-Key": api_key})
+    # POST is left out on purpose: creating a run is not idempotent and
+    # streamed upload bodies cannot be rewound, see _upload_one
+    retries = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "DELETE"]),
+        # Hand the last response back so commands report the error as before
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=UPLOAD_WORKERS,
+        pool_maxsize=UPLOAD_WORKERS,
+        max_retries=retries,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    _session = session
     return session
 
 
@@ -44,17 +166,72 @@ def format_size(size_bytes):
         return f"{size_bytes / (1024 * 1024):.2f} MB"
 
 
-def compress_file(file_path: str) -> str:
+def gzip_level(size: int) -> int:
+    if GZIP_LEVEL is not None:
+        return GZIP_LEVEL
+    return 1 if size > FAST_GZIP_MIN_SIZE else 6
+
+
+def _deflate_block(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # A sync flush ends the block on a byte boundary without marking the stream
+    # final, so independently compressed blocks can simply be concatenated
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def gzip_parallel(f_in: BinaryIO, f_out: BinaryIO, level: int):
+    # Same approach as pigz: zlib releases the GIL while deflating, so blocks
+    # compress concurrently and are joined into one standard gzip member
+    f_out.write(struct.pack("<4sIBB", b"\x1f\x8b\x08\x00", int(time.time()), 0, 255))
+    crc = 0
+    length = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=GZIP_WORKERS) as executor:
+        while block := f_in.read(COMPRESS_CHUNK_SIZE):
+            crc = zlib.crc32(block, crc)
+            length += len(block)
+            pending.append(executor.submit(_deflate_block, block, level))
+            # Bound the number of blocks held in memory
+            if len(pending) > GZIP_WORKERS * 2:
+                f_out.write(pending.popleft().result())
+        for future in pending:
+            f_out.write(future.result())
+    # Empty final deflate block, then the gzip trailer
+    f_out.write(b"\x03\x00")
+    f_out.write(struct.pack("<II", crc, length & 0xFFFFFFFF))
+
+
+def compress_file(
+    file_path: str, *, size: int, name: str
+) -> Optional[Tuple[BinaryIO, int]]:
     if (
-        os.path.basename(file_path) == "output.xml"
-        and os.path.getsize(file_path) > 1 * 1024 * 1024
-    ):  # 1MB
-        compressed_path = file_path + ".gz"
-        with open(file_path, "rb") as f_in:
-            with gzip.open(compressed_path, "wb") as f_out:
-                f_out.writelines(f_in)
-        return compressed_path
-    return file_path
+        not PRECOMPRESS
+        or name != COMPRESS_FILE_NAME
+        or size <= COMPRESS_MIN_SIZE
+    ):
+        return None
+    with open(file_path, "rb") as f_in:
+        if f_in.read(len(GZIP_MAGIC)) == GZIP_MAGIC:
+            # Already compressed despite the name
+            return None
+        f_in.seek(0)
+        # Compress in memory, or into an anonymous temporary file for very large
+        # inputs, so no .gz file is left next to the results
+        if size <= COMPRESS_IN_MEMORY_MAX_SIZE:
+            compressed = io.BytesIO()
+        else:
+            compressed = tempfile.TemporaryFile()
+        level = gzip_level(size)
+        if size > PARALLEL_GZIP_MIN_SIZE and GZIP_WORKERS > 1:
+            gzip_parallel(f_in, compressed, level)
+        else:
+            with gzip.GzipFile(
+                filename=name, mode="wb", compresslevel=level, fileobj=compressed
+            ) as f_out:
+                shutil.copyfileobj(f_in, f_out, COMPRESS_CHUNK_SIZE)
+    compressed_size = compressed.tell()
+    compressed.seek(0)
+    return compressed, compressed_size
 
 
 def upload_files(directory: str, tags=None):
@@ -67,30 +244,26 @@ def upload_files(directory: str, tags=None):
     # Validate and process tags
     processed_tags = []
     if tags:
+        match_tag = TAG_PATTERN.fullmatch
         for tag_str in tags:
-            if ":" in tag_str:
-                key, value = tag_str.split(":", 1)
-            else:
-                key = tag_str
-                value = "true"
-            key = key.strip()
-            value = value.strip()
-
-            if not TAG_KEY_PATTERN.fullmatch(key):
+            match = match_tag(tag_str.strip())
+            if not match:
                 print(
-                    f"Invalid tag key '{key}'. Must start with a letter, and be 1-50 characters long. Allowed characters: letters, numbers, '_', '-', '.'"
+                    f"Invalid tag '{tag_str}'. Keys must start with a letter, and be 1-50 characters long. Allowed characters: letters, numbers, '_', '-', '.'. "
+                    f"Values must be 1-100 characters long. Allowed characters: letters, numbers, spaces, '_', '-', '.', '/'"
                 )
                 continue
 
-            if not TAG_VALUE_PATTERN.fullmatch(value):
-                print(
-                    f"Invalid tag value '{value}'. Must be 1-100 characters long. Allowed characters: letters, numbers, spaces, '_', '-', '.', '/'"
-                )
-                continue
+            processed_tags.append(f"{match['key']}:{match['value'] or 'true'}")
 
-            processed_tags.append(f"{key}:{value}")
+    if not os.path.isdir(directory):
+        print(f"Directory not found: {directory}")
+        return
 
     files_to_upload, stats = find_robot_files(directory)
+    if not files_to_upload:
+        print(f"No Robot Framework test results found in {directory}")
+        return
 
     # Prepare run data
     run_data = {
@@ -102,68 +275,64 @@ def upload_files(directory: str, tags=None):
         "tags": processed_tags,
     }
 
-    create_run_url = f"{BASE_URL}/api/runs"
-    response = session.post(create_run_url, json=run_data)
+    response = session.post(
+        RUNS_URL,
+        data=_json_dumps(run_data),
+        headers={"Content-Type": "application/json"},
+    )
     if response.status_code != 200:
         print(f"Error creating run: {response.text}")
         return
 
-    run_id = response.json()["run_id"]
-    upload_url = f"{BASE_URL}/api/runs/{run_id}/upload"
-
-    if not files_to_upload:
-        print(f"No Robot Framework test results found in {directory}")
-        return
+    run_id = _json_loads(response.content)["run_id"]
+    upload_url = f"{RUNS_URL}/{run_id}/upload"
 
     print("Uploading results")
 
     total_size = 0
-    uploaded_files = []
-    html_files = []
-
-    for file_path in files_to_upload:
-        # Get the relative file path from the base directory, preserving subdirectories
-        file_name = os.path.relpath(file_path, start=directory)
-        original_size = os.path.getsize(file_path)
-
-        sys.stdout.write(f"  {file_name:<40} {format_size(original_size):>8}")
-        sys.stdout.flush()
-
-        file_to_upload = compress_file(file_path)
-        upload_size = os.path.getsize(file_to_upload)
-
-        if file_to_upload.endswith(".gz"):
-            sys.stdout.write(f" - compressed to {format_size(upload_size)}")
-            sys.stdout.flush()
-
-        with open(file_to_upload, "rb") as file:
-            file_to_upload_name = os.path.relpath(file_to_upload, start=directory)
-            # Send the file_name including subdirectory structure
-            files = {"file": (file_to_upload_name, file)}
-            response = session.post(upload_url, files=files)
-
-        if response.status_code == 200:
-            upload_response = response.json()
-            uploaded_files.append(upload_response)
-            sys.stdout.write(" [OK]\n")
-
-            if file_name.lower().endswith(".html"):
-                html_files.append(
-                    {
-                        "label": os.path.basename(file_name).capitalize()[:-5],
-                        "url": f"{BASE_URL}{upload_response['file_url']}",
-                    }
+    uploaded_files = {}
+
+    with ThreadPoolExecutor(
+        max_workers=min(UPLOAD_WORKERS, len(files_to_upload))
+    ) as executor:
+        futures = [
+            executor.submit(
+                _upload_one, session, upload_url, directory, file_path, file_size
+            )
+            for file_path, file_size in files_to_upload
+        ]
+        for future in as_completed(futures):
+            file_name, original_size, upload_size, compressed, response = future.result()
+
+            line = f"  {file_name:<40} {format_size(original_size):>8}"
+            if compressed:
+                line += (
+                    f" - compressed to {format_size(upload_size)}"
+                    f" (saved {format_size(original_size - upload_size)})"
                 )
-        else:
-            sys.stdout.write(" [FAIL]\n")
-            print(f"Error uploading {file_name}: {response.text}")
 
-        sys.stdout.flush()
+            if response.status_code == 200:
+                uploaded_files[file_name] = _json_loads(response.content)
+                line += " [OK]"
+            else:
+                line += f" [FAIL]\nError uploading {file_name}: {response.text}"
 
-        if file_to_upload.endswith(".gz"):
-            os.remove(file_to_upload)
+            # One write per file keeps progress readable without extra flushes
+            print(line, flush=True)
+            total_size += upload_size
 
-        total_size += upload_size
+    # Links follow the order the files were submitted in, not upload completion
+    html_files = []
+    for future in futures:
+        file_name = future.result()[0]
+        stem, extension = os.path.splitext(os.path.basename(file_name))
+        if extension.lower() == ".html" and file_name in uploaded_files:
+            html_files.append(
+                {
+                    "label": stem.capitalize(),
+                    "url": f"{BASE_URL}{uploaded_files[file_name]['file_url']}",
+                }
+            )
 
     if len(uploaded_files) == len(files_to_upload):
         print(f"\nRun ID: {run_id}")
@@ -205,90 +374,216 @@ def upload_files(directory: str, tags=None):
         print("\nUpload failed. Some files were not uploaded successfully.")
 
 
-def find_robot_files(directory: str) -> Tuple[List[str], Dict[str, Any]]:
+def _upload_one(
+    session, upload_url: str, directory: str, file_path: str, original_size: int
+):
+    # Get the relative file path from the base directory, preserving subdirectories
+    file_name = os.path.relpath(file_path, start=directory)
+
+    compressed_file = compress_file(
+        file_path, size=original_size, name=os.path.basename(file_path)
+    )
+    compressed = compressed_file is not None
+    if compressed:
+        file, upload_size = compressed_file
+        file_to_upload_name = file_name + ".gz"
+    else:
+        file = open(file_path, "rb")
+        file_to_upload_name = file_name
+        upload_size = original_size
+
+    with file:
+        for attempt in range(RETRY_TOTAL + 1):
+            if attempt:
+                time.sleep(RETRY_BACKOFF * (2 ** (attempt - 1)))
+                file.seek(0)
+            # Send the file_name including subdirectory structure. The encoder
+            # streams the file instead of building the whole body in memory.
+            encoder = MultipartEncoder(fields={"file": (file_to_upload_name, file)})
+            response = session.post(
+                upload_url,
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
+            )
+            if response.status_code not in RETRY_STATUSES:
+                break
+
+    return file_name, original_size, upload_size, compressed, response
+
+
+def find_robot_files(directory: str) -> Tuple[List[Tuple[str, int]], Dict[str, Any]]:
     robot_files = []
     stats = {}
     standard_files = ["log.html", "report.html", "output.xml"]
-    for filename in os.listdir(directory):
-        if filename in standard_files:
-            robot_files.append(os.path.join(directory, filename))
+    # Stat the known names directly rather than listing a directory that may
+    # contain thousands of screenshots
+    for filename in standard_files:
+        file_path = os.path.join(directory, filename)
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            continue
+        if stat.S_ISREG(file_stat.st_mode):
+            robot_files.append((file_path, file_stat.st_size))
 
     # Parse output.xml to find additional files
     output_xml_path = os.path.join(directory, "output.xml")
 
     if os.path.exists(output_xml_path):
         additional_files, stats = parse_output_xml(output_xml_path, directory)
-        robot_files.extend(list(additional_files))
+        # Links are resolved to absolute paths, so a message linking to e.g.
+        # log.html must not upload it a second time
+        additional_files.difference_update(
+            os.path.abspath(file_path) for file_path, _ in robot_files
+        )
+        robot_files.extend(
+            (file_path, os.path.getsize(file_path)) for file_path in additional_files
+        )
 
     return robot_files, stats
 
 
-class MsgHTMLParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.file_paths = []
+def list_files(directory: str) -> Optional[Set[str]]:
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except OSError:
+        return None
+
 
-    def handle_starttag(self, tag, attrs):
-        for attr_name, attr_value in attrs:
-            if attr_name in ["src", "href"]:
-                self.file_paths.append(attr_value)
+def extract_links(html_content: str) -> List[str]:
+    # Most html messages are plain formatting without any attribute values
+    if "=" not in html_content:
+        return []
+    links = []
+    for attributes in START_TAG_PATTERN.findall(html_content):
+        for name, double_quoted, single_quoted, unquoted in ATTRIBUTE_PATTERN.findall(
+            attributes
+        ):
+            if name.lower() in ("src", "href"):
+                links.append(html.unescape(double_quoted or single_quoted or unquoted))
+    return links
 
 
-def parse_output_xml(output_xml_path: str, base_directory: str) -> Tuple[Set[str], Dict[str, Any]]:
+def parse_output_xml(
+    output_xml_path: str, base_directory: str
+) -> Tuple[Set[str], Dict[str, Any]]:
     additional_files: Set[str] = set()
     base_directory = os.path.abspath(base_directory)
+    base_prefix = base_directory.rstrip(os.sep) + os.sep
+    # Screenshots are often linked many times, check each link only once
+    seen_links: Set[str] = set()
+    # Directory listings replace a stat per linked file
+    dir_files: Dict[str, Optional[Set[str]]] = {}
     stats = {"total_tests": 0, "passed": 0, "failed": 0, "skipped": 0, "verdict": None}
 
-    context = ET.iterparse(output_xml_path, events=("start", "end"))
-    inside_statistics = False
-    inside_total = False
-
-    for event, elem in context:
-        if event == "start":
-            if elem.tag == "statistics":
-                inside_statistics = True
-            elif inside_statistics and elem.tag == "total":
-                inside_total = True
-        elif event == "end":
-            if elem.tag == "statistics":
-                inside_statistics = False
-            elif inside_statistics and elem.tag == "total":
-                inside_total = False
-            elif inside_total and elem.tag == "stat":
-                if elem.text == "All Tests":
-                    print("Processing 'All Tests' stat")
-                    stats["total_tests"] = int(elem.attrib.get("pass", 0)) + int(elem.attrib.get("fail", 0)) + int(elem.attrib.get("skip", 0))
-                    stats["passed"] = int(elem.attrib.get("pass", 0))
-                    stats["failed"] = int(elem.attrib.get("fail", 0))
-                    stats["skipped"] = int(elem.attrib.get("skip", 0))
-            elif elem.tag == "msg" and elem.get("html") == "true":
-                html_content = elem.text or ""
-                parser = MsgHTMLParser()
-                parser.feed(html_content)
-                for file_path in parser.file_paths:
-                    resolved_path = os.path.join(base_directory, file_path)
-                    resolved_path = os.path.normpath(resolved_path)
-                    resolved_path = os.path.abspath(resolved_path)
-                    if os.path.commonprefix([resolved_path, base_directory]) == base_directory:
-                        if os.path.isfile(resolved_path):
-                            additional_files.add(resolved_path)
-            elem.clear()
+    if HAVE_LXML:
+        elements = _iter_lxml_elements(output_xml_path)
+    else:
+        elements = _iter_etree_elements(output_xml_path)
+
+    for elem in elements:
+        if elem.tag == "stat":
+            if elem.text == "All Tests":
+                print("Processing 'All Tests' stat")
+                passed = int(elem.get("pass", 0))
+                failed = int(elem.get("fail", 0))
+                skipped = int(elem.get("skip", 0))
+                stats["total_tests"] = passed + failed + skipped
+                stats["passed"] = passed
+                stats["failed"] = failed
+                stats["skipped"] = skipped
+        else:
+            html_content = elem.text or ""
+            for file_path in extract_links(html_content):
+                if file_path in seen_links:
+                    continue
+                seen_links.add(file_path)
+                # base_directory is absolute, so the joined path is as well
+                resolved_path = os.path.normpath(os.path.join(base_directory, file_path))
+                if not resolved_path.startswith(base_prefix):
+                    continue
+                dir_name, file_name = os.path.split(resolved_path)
+                if dir_name not in dir_files:
+                    dir_files[dir_name] = list_files(dir_name)
+                files_in_dir = dir_files[dir_name]
+                # Fall back to a stat for links that differ only in case
+                if files_in_dir is not None and (
+                    file_name in files_in_dir or os.path.isfile(resolved_path)
+                ):
+                    additional_files.add(resolved_path)
 
     stats["verdict"] = "pass" if stats["failed"] == 0 else "fail"
     return additional_files, stats
 
 
+# Both iterators yield the <stat> elements of <statistics>/<total> and the html
+# <msg> elements. Elements are cleared after use.
+def _iter_lxml_elements(output_xml_path: str):
+    # libxml2 filters by tag, so other elements never reach Python. Suites,
+    # tests, keywords and the control structure containers holding their
+    # bodies are included only to free them once they have been parsed;
+    # without e.g. <iter> every FOR loop iteration stays in memory.
+    tags = (
+        "stat",
+        "suite",
+        "test",
+        "kw",
+        "for",
+        "while",
+        "iter",
+        "if",
+        "try",
+        "branch",
+        "group",
+        "msg",
+    )
+    context = ET.iterparse(output_xml_path, events=("end",), tag=tags, huge_tree=True)
+    for _event, elem in context:
+        tag = elem.tag
+        if tag == "msg":
+            if elem.get("html") == "true":
+                yield elem
+        elif tag == "stat":
+            if elem.getparent().tag == "total":
+                yield elem
+        elem.clear()
+        # lxml keeps the parsed tree, so drop the already processed siblings
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def _iter_etree_elements(output_xml_path: str):
+    # Only end events: start events would double the per-element overhead
+    for _event, elem in ET.iterparse(output_xml_path):
+        tag = elem.tag
+        if tag == "msg":
+            if elem.get("html") == "true":
+                yield elem
+        elif tag == "stat":
+            # Kept until the enclosing <total>, <tag> or <suite> ends
+            continue
+        elif tag == "total":
+            yield from elem.iter("stat")
+        elem.clear()
+
+
 def get_run_info(run_id):
+    if run_id in _run_info_cache:
+        return _run_info_cache[run_id]
+
     try:
         session = get_session()
     except Exception as e:
         print(str(e))
         return
 
-    url = f"{BASE_URL}/api/runs/{run_id}"
+    url = f"{RUNS_URL}/{run_id}"
     response = session.get(url)
     if response.status_code == 200:
-        return response.json()
+        run_info = _json_loads(response.content)
+        _run_info_cache[run_id] = run_info
+        return run_info
     else:
         print(f"Failed to retrieve run info: {response.status_code}")
         print(f"Response content: {response.text}")
@@ -302,10 +597,9 @@ def list_runs():
         print(str(e))
         return
 
-    url = f"{BASE_URL}/api/runs"
-    response = session.get(url)
+    response = session.get(RUNS_URL)
     if response.status_code == 200:
-        runs = response.json()["runs"]
+        runs = _json_loads(response.content)["runs"]
         print("Available runs:")
         for run_id in runs:
             print(f"  {run_id}")
@@ -321,31 +615,50 @@ def download_files(run_id, output_dir):
         print(str(e))
         return
 
-    # Get run information
-    run_info_url = urljoin(BASE_URL, f"/api/runs/{run_id}")
-    response = session.get(run_info_url)
-    if response.status_code != 200:
-        print(f"Failed to retrieve run info: {response.status_code}")
-        print(f"Response content: {response.text}")
+    run_info = get_run_info(run_id)
+    if run_info is None:
         return
 
-    run_info = response.json()
     files = run_info.get("files", [])
+    if not files:
+        return
 
-    for file in files:
-        file_name = file["name"]
-        file_path = file["path"]
-        file_url = urljoin(BASE_URL, f"/files/{file_path}")
-
-        response = session.get(file_url)
-        if response.status_code == 200:
-            file_path = os.path.join(output_dir, file_name)
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-            print(f"Downloaded {file_name}")
-        else:
-            print(f"Failed to download {file_name}: {response.status_code}")
-            print(f"Response content: {response.text}")
+    downloaded = 0
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(files))) as executor:
+        futures = {
+            executor.submit(
+                _download_one,
+                session,
+                f"{FILES_URL}/{file['path']}",
+                os.path.join(output_dir, file["name"]),
+            ): file["name"]
+            for file in files
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            status_code, error = future.result()
+            if status_code == 200:
+                downloaded += 1
+                print(f"Downloaded {file_name}", flush=True)
+            else:
+                print(
+                    f"Failed to download {file_name}: {status_code}\n"
+                    f"Response content: {error}",
+                    flush=True,
+                )
+
+    print(f"\nDownloaded {downloaded} of {len(files)} files to {output_dir}")
+
+
+def _download_one(session, file_url: str, file_path: str) -> Tuple[int, str]:
+    with session.get(file_url, stream=True) as response:
+        if response.status_code != 200:
+            return response.status_code, response.text
+        # Write the body to disk as it arrives instead of buffering it
+        response.raw.decode_content = True
+        with open(file_path, "wb") as f:
+            shutil.copyfileobj(response.raw, f, DOWNLOAD_CHUNK_SIZE)
+    return response.status_code, ""
 
 
 def delete_run(run_id):
@@ -355,8 +668,9 @@ def delete_run(run_id):
         print(str(e))
         return
 
-    delete_url = f"{BASE_URL}/api/runs/{run_id}"
+    delete_url = f"{RUNS_URL}/{run_id}"
     response = session.delete(delete_url)
+    _run_info_cache.pop(run_id, None)
 
     if response.status_code == 200:
         print(f"Run {run_id} deleted successfully.")